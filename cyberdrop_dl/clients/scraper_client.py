@@ -4,6 +4,7 @@ import json
 import os
 
 import aiohttp
+import orjson
 from functools import wraps
 from typing import TYPE_CHECKING, Dict, Optional
 
@@ -119,7 +120,7 @@ class ScraperClient:
             assert content_type is not None
             if 'json' not in content_type.lower():
                 raise InvalidContentTypeFailure(message=f"Received {content_type}, was expecting JSON")
-            return await response.json()
+            return orjson.loads(await response.read())
 
     @limiter
     async def get_text(self, domain: str, url: URL, client_session: ClientSession) -> str:
@@ -19,6 +19,11 @@ if TYPE_CHECKING:
     from cyberdrop_dl.managers.manager import Manager
 
 
+BUNKR_MAINTENANCE_ETAGS = frozenset({'"eb669b6362e031fa2b0f1215480c4e30"', '"a9e4cee098dc6f1e09ec124299f26b30"'})
+IMGUR_REMOVED_ETAG = '"d835884373f4d6c8f24742ceabe74946"'
+SC_SCRAPE_IMAGE_ETAG = '"65b7753c-528a"'
+
+
 class ClientManager:
     """Creates a 'client' that can be referenced by scraping or download sessions"""
     def __init__(self, manager: Manager):
@@ -77,11 +82,12 @@ class ClientManager:
         headers = response.headers
 
         if download:
-            if headers.get('ETag') in ['"eb669b6362e031fa2b0f1215480c4e30"', '"a9e4cee098dc6f1e09ec124299f26b30"']:
+            etag = headers.get('ETag')
+            if etag in BUNKR_MAINTENANCE_ETAGS:
                 raise DownloadFailure(status="Bunkr Maintenance", message="Bunkr under maintenance")
-            if headers.get('ETag') == '"d835884373f4d6c8f24742ceabe74946"':
+            if etag == IMGUR_REMOVED_ETAG:
                 raise DownloadFailure(status=HTTPStatus.NOT_FOUND, message="Imgur image has been removed")
-            if headers.get('ETag') == '"65b7753c-528a"':
+            if etag == SC_SCRAPE_IMAGE_ETAG:
                 raise DownloadFailure(status=HTTPStatus.NOT_FOUND, message="SC Scrape Image")
 
         if HTTPStatus.OK <= status < HTTPStatus.BAD_REQUEST:
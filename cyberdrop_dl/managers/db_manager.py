@@ -40,6 +40,7 @@ class DBManager:
 
     async def close(self) -> None:
         """Close the DBManager"""
+        await self.history_table.close()
         await self._db_conn.close()
 
     async def _pre_allocate(self) -> None:
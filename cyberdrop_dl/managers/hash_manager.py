@@ -0,0 +1,89 @@
+from __future__ import annotations
+
+import asyncio
+import hashlib
+import mmap
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import TYPE_CHECKING, List, Optional
+
+import aiofiles
+
+try:
+    from blake3 import blake3
+except ImportError:
+    blake3 = None
+
+if TYPE_CHECKING:
+    from cyberdrop_dl.managers.manager import Manager
+
+CHUNK_SIZE = 4 * 1024 * 1024  # 4MB
+
+SUSPICIOUS_SIZES = frozenset({322509})  # bunkr maintenance image
+
+
+def _get_hasher():
+    """Returns a hasher object, preferring blake3 for its hardware accelerated throughput"""
+    if blake3 is not None:
+        return blake3()
+    return hashlib.blake2b()
+
+
+def _hash_file_sync(filename: str) -> str:
+    """Hashes a file by memory mapping it, feeding the hasher in one call without per-chunk copies"""
+    hasher = _get_hasher()
+    fd = os.open(filename, os.O_RDONLY)
+    try:
+        with mmap.mmap(fd, 0, access=mmap.ACCESS_READ) as mapped_file:
+            if hasattr(mapped_file, "madvise"):
+                mapped_file.madvise(mmap.MADV_SEQUENTIAL)
+            hasher.update(mapped_file)
+    finally:
+        os.close(fd)
+    return hasher.hexdigest()
+
+
+class HashManager:
+    def __init__(self, manager: 'Manager'):
+        self.manager = manager
+        self._pool = ProcessPoolExecutor(max_workers=os.cpu_count())
+
+    async def startup(self) -> None:
+        """Startup process for the HashManager"""
+        pass
+
+    async def close(self) -> None:
+        """Closes the HashManager"""
+        self._pool.shutdown(wait=False, cancel_futures=True)
+
+    def _get_hasher(self):
+        """Returns a hasher object, preferring blake3 for its hardware accelerated throughput"""
+        return _get_hasher()
+
+    async def hash_file(self, filename: str) -> str:
+        """Hashes a file and returns its hex digest"""
+        loop = asyncio.get_running_loop()
+        try:
+            return await loop.run_in_executor(None, _hash_file_sync, filename)
+        except (OSError, ValueError):
+            return await self._hash_file_chunked(filename)
+
+    async def hash_file_if_suspect(self, filename: str) -> Optional[str]:
+        """Hashes a file only when its size matches a known-bad size, a stat call skips the read entirely otherwise"""
+        if os.stat(filename).st_size not in SUSPICIOUS_SIZES:
+            return None
+        return await self.hash_file(filename)
+
+    async def hash_files(self, filenames: List[str]) -> List[str]:
+        """Hashes a batch of files across the process pool, one core per file"""
+        loop = asyncio.get_running_loop()
+        futures = [loop.run_in_executor(self._pool, _hash_file_sync, filename) for filename in filenames]
+        return list(await asyncio.gather(*futures))
+
+    async def _hash_file_chunked(self, filename: str) -> str:
+        """Hashes a file in chunks, for empty files and platforms where mmap fails"""
+        hasher = self._get_hasher()
+        async with aiofiles.open(filename, "rb") as fp:
+            while chunk := await fp.read(CHUNK_SIZE):
+                hasher.update(chunk)
+        return hasher.hexdigest()
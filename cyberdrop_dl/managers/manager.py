@@ -10,6 +10,7 @@ from cyberdrop_dl.managers.db_manager import DBManager
 from cyberdrop_dl.managers.cache_manager import CacheManager
 from cyberdrop_dl.managers.config_manager import ConfigManager
 from cyberdrop_dl.managers.download_manager import DownloadManager
+from cyberdrop_dl.managers.hash_manager import HashManager
 from cyberdrop_dl.managers.log_manager import LogManager
 from cyberdrop_dl.managers.path_manager import PathManager
 from cyberdrop_dl.managers.progress_manager import ProgressManager
@@ -29,6 +30,7 @@ class Manager:
         self.db_manager: DBManager = field(init=False)
         self.client_manager: ClientManager = field(init=False)
         self.download_manager: DownloadManager = field(init=False)
+        self.hash_manager: HashManager = field(init=False)
         self.progress_manager: ProgressManager = field(init=False)
 
         self.first_time_setup: TransitionManager = TransitionManager(self)
@@ -80,6 +82,9 @@ class Manager:
             self.client_manager = ClientManager(self)
         if not isinstance(self.download_manager, DownloadManager):
             self.download_manager = DownloadManager(self)
+        if not isinstance(self.hash_manager, HashManager):
+            self.hash_manager = HashManager(self)
+            await self.hash_manager.startup()
         self.progress_manager = ProgressManager(self)
         await self.progress_manager.startup()
 
@@ -168,3 +173,5 @@ class Manager:
     async def close(self) -> None:
         """Closes the manager"""
         await self.db_manager.close()
+        if isinstance(self.hash_manager, HashManager):
+            await self.hash_manager.close()
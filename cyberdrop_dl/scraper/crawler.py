@@ -180,7 +180,7 @@ class Crawler(ABC):
     
     async def check_album_results(self, url: URL, album_results: dict[Any, Any]) -> bool:
         """Checks whether an album has completed given its domain and album id"""
-        url_path = await get_db_path(url.with_query(""), self.domain)
+        url_path = get_db_path(url.with_query(""), self.domain)
         if album_results and url_path in album_results:
             if album_results[url_path] != 0:
                 await log(f"Skipping {url} as it has already been downloaded", 10)
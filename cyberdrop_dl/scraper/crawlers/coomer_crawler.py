@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 import calendar
 import datetime
 from typing import TYPE_CHECKING, Tuple, Dict
@@ -8,8 +9,9 @@ from aiolimiter import AsyncLimiter
 from yarl import URL
 
 from cyberdrop_dl.scraper.crawler import Crawler
+from cyberdrop_dl.utils.database.tables.history_table import get_db_path
 from cyberdrop_dl.utils.dataclasses.url_objects import ScrapeItem
-from cyberdrop_dl.utils.utilities import get_filename_and_ext, error_handling_wrapper
+from cyberdrop_dl.utils.utilities import get_filename_and_ext, error_handling_wrapper, log
 
 if TYPE_CHECKING:
     from cyberdrop_dl.managers.manager import Manager
@@ -21,49 +23,64 @@ class CoomerCrawler(Crawler):
         self.primary_base_domain = URL("https://coomer.su")
         self.ddos_guard_domain = URL("https://*.coomer.su")
         self.api_url = URL("https://coomer.su/api/v1")
+        self.data_url = self.primary_base_domain / "data"
         self.request_limiter = AsyncLimiter(4, 1)
 
+        self._separate_posts = manager.config_manager.settings_data['Download_Options']['separate_posts']
+        self._include_album_id = manager.config_manager.settings_data['Download_Options']['include_album_id_in_folder_name']
+        self._title_cache: Dict[str, str] = {}
+        self._fetch_routes = {"thumbnails": self.thumbnail, "post": self.post, "onlyfans": self.profile,
+                              "fansly": self.profile}
+
     """~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~"""
 
     async def fetch(self, scrape_item: ScrapeItem) -> None:
         """Determines where to send the scrape item based on the url"""
         task_id = await self.scraping_progress.add_task(scrape_item.url)
 
-        if "thumbnails" in scrape_item.url.parts:
-            parts = [x for x in scrape_item.url.parts if x not in ("thumbnail", "/")]
-            link = URL(f"https://{scrape_item.url.host}/{'/'.join(parts)}")
-            scrape_item.url = link
-            await self.handle_direct_link(scrape_item)
-        elif "post" in scrape_item.url.parts:
-            await self.post(scrape_item)
-        elif "onlyfans" in scrape_item.url.parts or "fansly" in scrape_item.url.parts:
-            await self.profile(scrape_item)
+        url_parts = set(scrape_item.url.parts)
+        for token, handler in self._fetch_routes.items():
+            if token in url_parts:
+                await handler(scrape_item)
+                break
         else:
             await self.handle_direct_link(scrape_item)
 
         await self.scraping_progress.remove_task(task_id)
 
+    @error_handling_wrapper
+    async def thumbnail(self, scrape_item: ScrapeItem) -> None:
+        """Rewrites a thumbnail link to the full size file and downloads it"""
+        parts = [x for x in scrape_item.url.parts if x not in ("thumbnail", "/")]
+        link = URL(f"https://{scrape_item.url.host}/{'/'.join(parts)}")
+        scrape_item.url = link
+        await self.handle_direct_link(scrape_item)
+
     @error_handling_wrapper
     async def profile(self, scrape_item: ScrapeItem) -> None:
         """Scrapes a profile"""
-        offset = 0
-        service, user = await self.get_service_and_user(scrape_item)
+        service, user = self.get_service_and_user(scrape_item)
         user_str = await self.get_user_str_from_profile(scrape_item)
         api_call = self.api_url / service / "user" / user
-        while True:
-            async with self.request_limiter:
-                JSON_Resp = await self.client.get_json(self.domain, api_call.with_query({"o": offset}))
-                offset += 50
-                if not JSON_Resp:
-                    break
-
-            for post in JSON_Resp:
+
+        offset = 0
+        posts = await self.get_profile_posts(api_call, offset)
+        while posts:
+            offset += 50
+            next_page = asyncio.create_task(self.get_profile_posts(api_call, offset))
+            for post in posts:
                 await self.handle_post_content(scrape_item, post, user, user_str)
+            posts = await next_page
+
+    async def get_profile_posts(self, api_call: URL, offset: int) -> Dict:
+        """Gets a page of posts from a profile"""
+        async with self.request_limiter:
+            return await self.client.get_json(self.domain, api_call.with_query({"o": offset}))
 
     @error_handling_wrapper
     async def post(self, scrape_item: ScrapeItem) -> None:
         """Scrapes a post"""
-        service, user, post_id = await self.get_service_user_and_post(scrape_item)
+        service, user, post_id = self.get_service_user_and_post(scrape_item)
         user_str = await self.get_user_str_from_post(scrape_item)
         api_call = self.api_url / service / "user" / user / "post" / post_id
         async with self.request_limiter:
@@ -82,16 +99,21 @@ class CoomerCrawler(Crawler):
         if not post_title:
             post_title = "Untitled"
 
-        async def handle_file(file_obj):
-            link = self.primary_base_domain / ("data" + file_obj['path'])
-            link = link.with_query({"f": file_obj['name']})
-            await self.create_new_scrape_item(link, scrape_item, user_str, post_title, post_id, date)
-
+        files = []
         if post['file']:
-            await handle_file(post['file'])
-
-        for file in post['attachments']:
-            await handle_file(file)
+            files.append(post['file'])
+        files.extend(post['attachments'])
+
+        links = [(self.data_url / file['path'].lstrip("/")).with_query({"f": file['name']}) for file in files]
+        url_paths = [get_db_path(link, self.domain) for link in links]
+        completed_paths = await self.manager.db_manager.history_table.check_complete_bulk(self.domain, url_paths)
+
+        for link, url_path in zip(links, url_paths):
+            if url_path in completed_paths:
+                await log(f"Skipping {link} as it has already been downloaded", 10)
+                await self.manager.progress_manager.download_progress.add_previously_completed()
+                continue
+            await self.create_new_scrape_item(link, scrape_item, user_str, post_title, post_id, date)
 
     @error_handling_wrapper
     async def handle_direct_link(self, scrape_item: ScrapeItem) -> None:
@@ -104,9 +126,10 @@ class CoomerCrawler(Crawler):
 
     """~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~~"""
 
-    async def parse_datetime(self, date: str) -> int:
+    @staticmethod
+    def parse_datetime(date: str) -> int:
         """Parses a datetime string"""
-        date = datetime.datetime.strptime(date, "%Y-%m-%d %H:%M:%S")
+        date = datetime.datetime.fromisoformat(date)
         return calendar.timegm(date.timetuple())
 
     async def get_user_str_from_post(self, scrape_item: ScrapeItem) -> str:
@@ -123,13 +146,15 @@ class CoomerCrawler(Crawler):
         user = soup.select_one("span[itemprop=name]").text
         return user
 
-    async def get_service_and_user(self, scrape_item: ScrapeItem) -> Tuple[str, str]:
+    @staticmethod
+    def get_service_and_user(scrape_item: ScrapeItem) -> Tuple[str, str]:
         """Gets the service and user from a scrape item"""
         user = scrape_item.url.parts[3]
         service = scrape_item.url.parts[1]
         return service, user
 
-    async def get_service_user_and_post(self, scrape_item: ScrapeItem) -> Tuple[str, str, str]:
+    @staticmethod
+    def get_service_user_and_post(scrape_item: ScrapeItem) -> Tuple[str, str, str]:
         """Gets the service, user and post id from a scrape item"""
         user = scrape_item.url.parts[3]
         service = scrape_item.url.parts[1]
@@ -140,12 +165,15 @@ class CoomerCrawler(Crawler):
                                      date: str) -> None:
         """Creates a new scrape item with the same parent as the old scrape item"""
         post_title = None
-        if self.manager.config_manager.settings_data['Download_Options']['separate_posts']:
+        if self._separate_posts:
             post_title = f"{date} - {title}"
-            if self.manager.config_manager.settings_data['Download_Options']['include_album_id_in_folder_name']:
+            if self._include_album_id:
                 post_title = post_id + " - " + post_title
 
-        new_title = await self.create_title(user, None, None)
-        new_scrape_item = await self.create_scrape_item(old_scrape_item, link, new_title, True, None, await self.parse_datetime(date))
+        new_title = self._title_cache.get(user)
+        if new_title is None:
+            new_title = await self.create_title(user, None, None)
+            self._title_cache[user] = new_title
+        new_scrape_item = await self.create_scrape_item(old_scrape_item, link, new_title, True, None, self.parse_datetime(date))
         await new_scrape_item.add_to_parent_title(post_title)
         self.manager.task_group.create_task(self.run(new_scrape_item))
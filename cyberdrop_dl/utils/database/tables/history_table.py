@@ -1,5 +1,6 @@
 from __future__ import annotations
 
+import asyncio
 from sqlite3 import Row, IntegrityError
 
 import aiosqlite
@@ -12,7 +13,11 @@ if TYPE_CHECKING:
     from cyberdrop_dl.utils.dataclasses.url_objects import MediaItem
 
 
-async def get_db_path(url: URL, referer: str = "") -> str:
+_SHAREX_DOMAINS = frozenset({"img.kiwi", "jpg.church", "jpg.homes", "jpg.fish", "jpg.fishing", "jpg.pet", "jpeg.pet",
+                             "jpg1.su", "jpg2.su", "jpg3.su"})
+
+
+def get_db_path(url: URL, referer: str = "") -> str:
     """Gets the URL path to be put into the DB and checked from the DB"""
     url_path = url.path
 
@@ -25,61 +30,131 @@ async def get_db_path(url: URL, referer: str = "") -> str:
     return url_path
 
 
-async def get_db_domain(domain: str) -> str:
+def get_db_domain(domain: str) -> str:
     """Gets the domain to be put into the DB and checked from the DB"""
-    if domain in ("img.kiwi", "jpg.church", "jpg.homes", "jpg.fish", "jpg.fishing", "jpg.pet", "jpeg.pet", "jpg1.su",
-                  "jpg2.su", "jpg3.su"):
-        domain = "sharex"
+    if domain in _SHAREX_DOMAINS:
+        return "sharex"
     return domain
 
 
+def get_media_db_path(media_item: MediaItem) -> str:
+    """Gets the DB path for a media item, caching it on the item so repeat operations skip the rework"""
+    if not isinstance(media_item.db_path, str):
+        media_item.db_path = get_db_path(media_item.url, media_item.referer_str)
+    return media_item.db_path
+
+
 class HistoryTable:
     def __init__(self, db_conn: aiosqlite.Connection):
         self.db_conn: aiosqlite.Connection = db_conn
         self.ignore_history: bool = False
 
+        self._pending_completions: list = []
+        self._pending_completion_keys: set = set()
+        self._flush_task: asyncio.Task = None
+
     async def startup(self) -> None:
         """Startup process for the HistoryTable"""
+        await self.set_pragmas()
         await self.db_conn.execute(create_history)
         await self.db_conn.commit()
         await self.fix_primary_keys()
         await self.add_columns()
         await self.fix_bunkr_v4_entries()
+        await self.create_indexes()
+        self._flush_task = asyncio.create_task(self._flush_loop())
+
+    async def close(self) -> None:
+        """Close process for the HistoryTable, flushes anything still pending"""
+        if self._flush_task is not None:
+            self._flush_task.cancel()
+        await self.flush_completions()
+
+    async def _flush_loop(self) -> None:
+        """Periodically flushes coalesced completion writes"""
+        while True:
+            await asyncio.sleep(0.5)
+            await self.flush_completions()
+
+    async def flush_completions(self) -> None:
+        """Writes all pending completions in a single transaction"""
+        if not self._pending_completions:
+            return
+        batch, self._pending_completions = self._pending_completions, []
+        await self.db_conn.executemany("""UPDATE media SET completed = 1, completed_at = CURRENT_TIMESTAMP, completed_at_ts = strftime('%s', 'now') WHERE domain = ? and url_path = ?""", batch)
+        await self.db_conn.commit()
+        self._pending_completion_keys.difference_update(batch)
+
+    async def set_pragmas(self) -> None:
+        """Sets the pragmas for write throughput, every writer method commits so fsync cost dominates"""
+        await self.db_conn.execute("""PRAGMA journal_mode = WAL""")
+        await self.db_conn.execute("""PRAGMA synchronous = NORMAL""")
+        await self.db_conn.execute("""PRAGMA temp_store = MEMORY""")
+        await self.db_conn.execute("""PRAGMA cache_size = -65536""")
+        await self.db_conn.execute("""PRAGMA mmap_size = 268435456""")
+        await self.db_conn.execute("""PRAGMA busy_timeout = 5000""")
+        await self.db_conn.commit()
+
+    async def create_indexes(self) -> None:
+        """Creates the indexes backing the per-file lookups, without them every check scans the table"""
+        await self.db_conn.execute("""CREATE INDEX IF NOT EXISTS idx_media_domain_urlpath ON media (domain, url_path)""")
+        await self.db_conn.execute("""CREATE INDEX IF NOT EXISTS idx_media_domain_referer ON media (domain, referer)""")
+        await self.db_conn.execute("""CREATE INDEX IF NOT EXISTS idx_media_domain_album ON media (domain, album_id)""")
+        await self.db_conn.execute("""CREATE INDEX IF NOT EXISTS idx_media_download_filename ON media (download_filename)""")
+        await self.db_conn.execute("""CREATE INDEX IF NOT EXISTS idx_media_completed_at_ts ON media (completed_at_ts)""")
+        await self.db_conn.commit()
 
     async def check_complete(self, domain: str, url: URL, referer: URL) -> bool:
         """Checks whether an individual file has completed given its domain and url path"""
         if self.ignore_history:
             return False
 
-        domain = await get_db_domain(domain)
+        domain = get_db_domain(domain)
 
-        url_path = await get_db_path(url, domain)
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT referer, completed FROM media WHERE domain = ? and url_path = ?""", (domain, url_path))
+        url_path = get_db_path(url, domain)
+        if (domain, url_path) in self._pending_completion_keys:
+            return True
+        result = await self.db_conn.execute("""SELECT referer, completed FROM media WHERE domain = ? and url_path = ?""", (domain, url_path))
         sql_file_check = await result.fetchone()
         if sql_file_check and sql_file_check[1] != 0:
             # Update the referer if it has changed so that check_complete_by_referer can work
             if str(referer) != sql_file_check[0]:
-                await cursor.execute("""UPDATE media SET referer = ? WHERE domain = ? and url_path = ?""", (str(referer), domain, url_path))
+                await self.db_conn.execute("""UPDATE media SET referer = ? WHERE domain = ? and url_path = ?""", (str(referer), domain, url_path))
                 await self.db_conn.commit()
             return True
         return False
     
+    async def check_complete_bulk(self, domain: str, url_paths: Iterable[str]) -> set:
+        """Checks a batch of url paths in one query, returning the set of paths that have completed"""
+        if self.ignore_history:
+            return set()
+
+        domain = get_db_domain(domain)
+        url_paths = list(url_paths)
+        completed = {url_path for pending_domain, url_path in self._pending_completion_keys if pending_domain == domain}
+        completed.intersection_update(url_paths)
+        for i in range(0, len(url_paths), 500):
+            batch = url_paths[i:i + 500]
+            placeholders = ", ".join("?" * len(batch))
+            result = await self.db_conn.execute(f"""SELECT url_path FROM media WHERE domain = ? and completed != 0 and url_path IN ({placeholders})""", (domain, *batch))
+            rows = await result.fetchall()
+            completed.update(row[0] for row in rows)
+        return completed
+
     async def check_album(self, domain: str, album_id: str) -> bool | dict[Any, Any]:
         """Checks whether an album has completed given its domain and album id"""
         if self.ignore_history:
             return False
 
-        domain = await get_db_domain(domain)
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT url_path, completed FROM media WHERE domain = ? and album_id = ?""", (domain, album_id))
+        domain = get_db_domain(domain)
+        result = await self.db_conn.execute("""SELECT url_path, completed FROM media WHERE domain = ? and album_id = ?""", (domain, album_id))
         result = await result.fetchall()
         return {row[0]: row[1] for row in result}
     
     async def set_album_id(self, domain: str, media_item: MediaItem) -> None:
         """Sets an album_id in the database"""
-        domain = await get_db_domain(domain)
-        url_path = await get_db_path(media_item.url, str(media_item.referer))
+        domain = get_db_domain(domain)
+        url_path = get_media_db_path(media_item)
         await self.db_conn.execute("""UPDATE media SET album_id = ? WHERE domain = ? and url_path = ?""",
                                    (media_item.album_id, domain, url_path))
         await self.db_conn.commit()
@@ -89,57 +164,50 @@ class HistoryTable:
         if self.ignore_history:
             return False
 
-        domain = await get_db_domain(domain)
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT completed FROM media WHERE domain = ? and referer = ?""", (domain, str(referer)))
+        domain = get_db_domain(domain)
+        result = await self.db_conn.execute("""SELECT completed FROM media WHERE domain = ? and referer = ?""", (domain, str(referer)))
         sql_file_check = await result.fetchone()
         return sql_file_check and sql_file_check[0] != 0
 
     async def insert_incompleted(self, domain: str, media_item: MediaItem) -> None:
         """Inserts an uncompleted file into the database"""
-        domain = await get_db_domain(domain)
-        url_path = await get_db_path(media_item.url, str(media_item.referer))
+        domain = get_db_domain(domain)
+        url_path = get_media_db_path(media_item)
         download_filename = media_item.download_filename if isinstance(media_item.download_filename, str) else ""
         try:
             await self.db_conn.execute("""UPDATE media SET domain = ?, album_id = ? WHERE domain = 'no_crawler' and url_path = ? and referer = ?""", 
-                                       (domain, media_item.album_id, url_path, str(media_item.referer)))
+                                       (domain, media_item.album_id, url_path, media_item.referer_str))
         except IntegrityError:
             await self.db_conn.execute("""DELETE FROM media WHERE domain = 'no_crawler' and url_path = ?""", (url_path,))
-        await self.db_conn.execute("""INSERT OR IGNORE INTO media (domain, url_path, referer, album_id, download_path, download_filename, original_filename, completed, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)""",
-                                   (domain, url_path, str(media_item.referer), media_item.album_id, str(media_item.download_folder), download_filename, media_item.original_filename, 0))
-        await self.db_conn.execute("""UPDATE media SET download_filename = ? WHERE domain = ? and url_path = ?""",
-                                   (download_filename, domain, url_path))
+        await self.db_conn.execute("""INSERT INTO media (domain, url_path, referer, album_id, download_path, download_filename, original_filename, completed, created_at) VALUES (?, ?, ?, ?, ?, ?, ?, 0, CURRENT_TIMESTAMP) ON CONFLICT (domain, url_path, original_filename) DO UPDATE SET album_id = excluded.album_id, download_filename = excluded.download_filename""",
+                                   (domain, url_path, media_item.referer_str, media_item.album_id, str(media_item.download_folder), download_filename, media_item.original_filename))
         await self.db_conn.commit()
 
     async def mark_complete(self, domain: str, media_item: MediaItem) -> None:
-        """Mark a download as completed in the database"""
-        domain = await get_db_domain(domain)
-        url_path = await get_db_path(media_item.url, str(media_item.referer))
-        await self.db_conn.execute("""UPDATE media SET completed = 1, completed_at = CURRENT_TIMESTAMP WHERE domain = ? and url_path = ?""",
-                                   (domain, url_path))
-        await self.db_conn.commit()
+        """Mark a download as completed, the coalescer flushes it with the next batch"""
+        domain = get_db_domain(domain)
+        url_path = get_media_db_path(media_item)
+        self._pending_completions.append((domain, url_path))
+        self._pending_completion_keys.add((domain, url_path))
 
     async def check_filename_exists(self, filename: str) -> bool:
         """Checks whether a downloaded filename exists in the database"""
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT EXISTS(SELECT 1 FROM media WHERE download_filename = ?)""", (filename,))
+        result = await self.db_conn.execute("""SELECT 1 FROM media WHERE download_filename = ? LIMIT 1""", (filename,))
         sql_file_check = await result.fetchone()
-        return sql_file_check == 1
+        return sql_file_check is not None
 
     async def get_downloaded_filename(self, domain: str, media_item: MediaItem) -> str:
         """Returns the downloaded filename from the database"""
-        domain = await get_db_domain(domain)
-        url_path = await get_db_path(media_item.url, str(media_item.referer))
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT download_filename FROM media WHERE domain = ? and url_path = ?""",
+        domain = get_db_domain(domain)
+        url_path = get_media_db_path(media_item)
+        result = await self.db_conn.execute("""SELECT download_filename FROM media WHERE domain = ? and url_path = ?""",
                                       (domain, url_path))
         sql_file_check = await result.fetchone()
         return sql_file_check[0] if sql_file_check else None
 
     async def get_failed_items(self) -> Iterable[Row]:
         """Returns a list of failed items"""
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT referer, download_path FROM media WHERE completed = 0""")
+        result = await self.db_conn.execute("""SELECT referer, download_path FROM media WHERE completed = 0""")
         failed_files = await result.fetchall()
         return failed_files
 
@@ -147,22 +215,14 @@ class HistoryTable:
 
     async def fix_bunkr_v4_entries(self) -> None:
         """Fixes bunkr v4 entries in the database"""
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""SELECT * from media WHERE domain = 'bunkr' and completed = 1""")
-        bunkr_entries = await result.fetchall()
-
-        for entry in bunkr_entries:
-            entry = list(entry)
-            entry[0] = "bunkrr"
-            await self.db_conn.execute("""INSERT or REPLACE INTO media VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)""", entry)
-        await self.db_conn.commit()
-
+        await self.db_conn.execute("""INSERT OR REPLACE INTO media (domain, url_path, referer, album_id, download_path, download_filename, original_filename, completed, created_at, completed_at, completed_at_ts)
+                                      SELECT 'bunkrr', url_path, referer, album_id, download_path, download_filename, original_filename, completed, created_at, completed_at, completed_at_ts
+                                      FROM media WHERE domain = 'bunkr' and completed = 1""")
         await self.db_conn.execute("""DELETE FROM media WHERE domain = 'bunkr'""")
         await self.db_conn.commit()
 
     async def fix_primary_keys(self) -> None:
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""pragma table_info(media)""")
+        result = await self.db_conn.execute("""pragma table_info(media)""")
         result = await result.fetchall()
         if result[0][5] == 0:
             print("Fixing primary keys in the database: DO NOT EXIT THE PROGRAM")
@@ -179,8 +239,7 @@ class HistoryTable:
             await self.db_conn.commit()
 
     async def add_columns(self) -> None:
-        cursor = await self.db_conn.cursor()
-        result = await cursor.execute("""pragma table_info(media)""")
+        result = await self.db_conn.execute("""pragma table_info(media)""")
         result = await result.fetchall()
         current_cols = [col[1] for col in result]
         
@@ -195,3 +254,8 @@ class HistoryTable:
         if "completed_at" not in current_cols:
             await self.db_conn.execute("""ALTER TABLE media ADD COLUMN completed_at TIMESTAMP""")
             await self.db_conn.commit()
+
+        if "completed_at_ts" not in current_cols:
+            await self.db_conn.execute("""ALTER TABLE media ADD COLUMN completed_at_ts INT""")
+            await self.db_conn.execute("""UPDATE media SET completed_at_ts = strftime('%s', completed_at) WHERE completed_at IS NOT NULL""")
+            await self.db_conn.commit()
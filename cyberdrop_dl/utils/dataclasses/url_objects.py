@@ -13,6 +13,8 @@ class MediaItem:
     def __init__(self, url: "URL", referer: "URL", album_id: Union[str, None], download_folder: Path, filename: str, ext: str, original_filename: str):
         self.url: URL = url
         self.referer: URL = referer
+        self.referer_str: str = str(referer)
+        self.db_path: str = field(init=False)
         self.album_id: Union[str, None] = album_id
         self.download_folder: Path = download_folder
         self.filename: str = filename